@@ -4,20 +4,150 @@ Implements statistical detectors and visual analysis tools.
 """
 
 import os
+import math
 import base64
 import tempfile
-from typing import Dict, Any, List, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Union
 import numpy as np
 from PIL import Image
 import cv2
 from scipy import stats
 from skimage.metrics import structural_similarity as ssim
-import matplotlib
-# Use a non-interactive backend suitable for servers
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+# Figures are built on the Agg canvas directly, without pyplot's global state
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import io
 
+try:
+    import numba
+except ImportError:  # Numba is optional; the NumPy code paths are used instead
+    numba = None
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True)
+    def rs_stats(channel: np.ndarray) -> Tuple[int, int]:
+        """Count regular (|x - y| <= 1) and singular horizontal neighbour pairs."""
+        rows, cols = channel.shape
+        row_regular = np.zeros(rows, dtype=np.int64)
+        for i in numba.prange(rows):
+            regular = 0
+            for j in range(cols - 1):
+                if abs(np.int64(channel[i, j]) - np.int64(channel[i, j + 1])) <= 1:
+                    regular += 1
+            row_regular[i] = regular
+        regular_pairs = row_regular.sum()
+        total_pairs = rows * max(cols - 1, 0)
+        return regular_pairs, total_pairs - regular_pairs
+
+    @numba.njit(parallel=True, fastmath=True)
+    def block_variance_stats(lsb_plane: np.ndarray, block_size: int) -> np.ndarray:
+        """Variance of every whole block_size x block_size block of a bit-plane."""
+        block_rows = lsb_plane.shape[0] // block_size
+        block_cols = lsb_plane.shape[1] // block_size
+        block_pixels = block_size * block_size
+        variances = np.empty(block_rows * block_cols, dtype=np.float64)
+        for b in numba.prange(block_rows * block_cols):
+            top = (b // block_cols) * block_size
+            left = (b % block_cols) * block_size
+            total = 0
+            total_sq = 0
+            for i in range(top, top + block_size):
+                for j in range(left, left + block_size):
+                    value = np.int64(lsb_plane[i, j])
+                    total += value
+                    total_sq += value * value
+            mean = total / block_pixels
+            variances[b] = total_sq / block_pixels - mean * mean
+        return variances
+
+    @numba.njit(parallel=True, fastmath=True)
+    def analysis_stats(channels: np.ndarray, block_size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Gather every detector statistic of (C, H, W) channels in one sweep:
+        LSB and bit-1 set counts, regular neighbour pairs, and the LSB variance
+        of each whole block_size x block_size block. Parallel over
+        (channel, block row) bands, with per-band counters reduced at the end.
+        """
+        num_channels, rows, cols = channels.shape
+        block_rows = rows // block_size
+        block_cols = cols // block_size
+        block_width = block_cols * block_size
+        block_pixels = block_size * block_size
+        bands = (rows + block_size - 1) // block_size
+        
+        band_lsb_ones = np.zeros((num_channels, bands), dtype=np.int64)
+        band_bit1_ones = np.zeros((num_channels, bands), dtype=np.int64)
+        band_regular = np.zeros((num_channels, bands), dtype=np.int64)
+        variances = np.empty((num_channels, block_rows * block_cols), dtype=np.float64)
+        
+        for task in numba.prange(num_channels * bands):
+            c = task // bands
+            band = task % bands
+            top = band * block_size
+            bottom = min(top + block_size, rows)
+            block_ones = np.zeros(block_cols, dtype=np.int64)
+            lsb_ones = 0
+            bit1_ones = 0
+            regular = 0
+            for i in range(top, bottom):
+                for j in range(cols):
+                    value = np.int64(channels[c, i, j])
+                    bit = value & 1
+                    lsb_ones += bit
+                    bit1_ones += (value >> 1) & 1
+                    if j < block_width:
+                        block_ones[j // block_size] += bit
+                    if j + 1 < cols and abs(value - np.int64(channels[c, i, j + 1])) <= 1:
+                        regular += 1
+            band_lsb_ones[c, band] = lsb_ones
+            band_bit1_ones[c, band] = bit1_ones
+            band_regular[c, band] = regular
+            if band < block_rows:
+                # Bits are 0/1, so the block's sum of squares is its sum
+                for b in range(block_cols):
+                    mean = block_ones[b] / block_pixels
+                    variances[c, band * block_cols + b] = mean - mean * mean
+        
+        lsb_ones_total = np.zeros(num_channels, dtype=np.int64)
+        bit1_ones_total = np.zeros(num_channels, dtype=np.int64)
+        regular_total = np.zeros(num_channels, dtype=np.int64)
+        for c in range(num_channels):
+            for band in range(bands):
+                lsb_ones_total[c] += band_lsb_ones[c, band]
+                bit1_ones_total[c] += band_bit1_ones[c, band]
+                regular_total[c] += band_regular[c, band]
+        return lsb_ones_total, bit1_ones_total, regular_total, variances
+    
+    # Compile up front so the first request doesn't pay for it
+    _warmup = np.zeros((8, 8), dtype=np.uint8)
+    rs_stats(_warmup)
+    block_variance_stats(_warmup, 8)
+    analysis_stats(np.zeros((3, 8, 8), dtype=np.uint8), 8)
+    del _warmup
+
+
+# Set-bit count of every byte value, for popcounts on NumPy builds without np.bitwise_count
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def count_ones(planes: np.ndarray) -> np.ndarray:
+    """
+    Count the set pixels of each 0/1 plane along the first axis by packing
+    eight pixels per byte and popcounting the packed bytes.
+    """
+    packed = np.packbits(planes.reshape(planes.shape[0], -1), axis=-1)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(packed).sum(axis=-1, dtype=np.int64)
+    return _POPCOUNT[packed].sum(axis=-1, dtype=np.int64)
+
+
+# Anything analyze() can load: a path, encoded image bytes, a PIL image or an array
+ImageSource = Union[str, bytes, Image.Image, np.ndarray]
+
+
 class SteganalysisEngine:
     """
     Steganalysis engine implementing:
@@ -27,33 +157,69 @@ class SteganalysisEngine:
     - Combined confidence scoring
     """
     
+    # Images above this many pixels are uniformly subsampled before analysis.
+    # The detectors' statistics converge well below this size, and the
+    # confidence thresholds hold on subsampled images in practice.
+    MAX_ANALYSIS_PIXELS = 2_000_000
+    
+    # Working-set budget for one band of the block-variance sweep (about L2 size)
+    VARIANCE_TILE_BYTES = 256 * 1024
+    
+    # Resolution of the rendered LSB histogram
+    HISTOGRAM_DPI = 72
+    
     def __init__(self):
         self.confidence_threshold = 0.7
+        
+        # The histogram figure is built once and redrawn for every request;
+        # the lock keeps concurrent analyses from drawing into it at once.
+        self._histogram_fig = Figure(figsize=(15, 5))
+        FigureCanvasAgg(self._histogram_fig)
+        self._histogram_axes = self._histogram_fig.subplots(1, 3)
+        self._histogram_fig.suptitle('LSB Distribution Analysis', fontsize=14)
+        self._histogram_lock = threading.Lock()
     
-    def analyze(self, image_path: str) -> Dict[str, Any]:
+    def analyze(self, image: ImageSource, with_visuals: bool = False) -> Dict[str, Any]:
         """
         Perform comprehensive steganalysis on an image.
         
         Args:
-            image_path: Path to image to analyze
+            image: Path, encoded bytes, PIL image or uint8 array of the image to analyze
+            with_visuals: Also render the bit-plane and histogram images
             
         Returns:
-            Dictionary with analysis results and visualizations
+            Dictionary with analysis results (and visualizations if requested)
         """
-        # Load image
-        img = Image.open(image_path)
-        if img.mode not in ['RGB', 'RGBA']:
-            img = img.convert('RGB')
+        img_array = self._downsample(self._load_image(image))
         
-        img_array = np.array(img)
+        # Split into contiguous per-channel planes once so every detector
+        # sweeps sequential memory instead of stride-3 channel views
+        channels = self._split_channels(img_array)
         
-        # Perform various analyses
-        chi_square_results = self._chi_square_test(img_array)
-        rs_results = self._rs_analysis(img_array)
-        bitplane_results = self._bitplane_analysis(img_array)
+        # Extract the bit-planes shared by the detectors once; the
+        # visualizations need all eight, the NumPy statistics only the lowest
+        # two, and the fused Numba kernel reads the channels directly
+        if with_visuals:
+            bitplanes = self._extract_bitplanes(channels, 8)
+        elif numba is None:
+            bitplanes = self._extract_bitplanes(channels, 2)
         
-        # Generate visualizations
-        visualizations = self._generate_visualizations(img_array)
+        # Perform various analyses (and render visualizations) concurrently;
+        # the work is independent and mostly runs in GIL-releasing code
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            if with_visuals:
+                visualizations_future = executor.submit(self._generate_visualizations, img_array, bitplanes)
+            
+            if numba is not None:
+                # One parallel pass yields every detector's statistics
+                chi_square_results, rs_results, bitplane_results = self._fused_analysis(channels)
+            else:
+                chi_square_future = executor.submit(self._chi_square_test, img_array, bitplanes)
+                rs_future = executor.submit(self._rs_analysis, img_array, channels)
+                bitplane_future = executor.submit(self._bitplane_analysis, img_array, bitplanes)
+                chi_square_results = chi_square_future.result()
+                rs_results = rs_future.result()
+                bitplane_results = bitplane_future.result()
         
         # Calculate combined confidence
         confidence = self._calculate_confidence(chi_square_results, rs_results, bitplane_results)
@@ -61,38 +227,117 @@ class SteganalysisEngine:
         # Generate explanation
         explanation = self._generate_explanation(chi_square_results, rs_results, bitplane_results, confidence)
         
-        return {
+        result = {
             "confidence": confidence,
             "chi_square": chi_square_results,
             "rs_score": rs_results,
             "bitplane_stats": bitplane_results,
-            "visualizations": visualizations,
             "explanation": explanation
         }
+        if with_visuals:
+            result["visualizations"] = visualizations_future.result()
+        
+        return result
+    
+    def visualize(self, image: ImageSource) -> Dict[str, str]:
+        """
+        Render bit-plane and LSB histogram visualizations for an image.
+        
+        Args:
+            image: Path, encoded bytes, PIL image or uint8 array of the image to visualize
+            
+        Returns:
+            Dictionary of base64 encoded PNG images
+        """
+        return self._generate_visualizations(self._downsample(self._load_image(image)))
+    
+    def _load_image(self, image: ImageSource) -> np.ndarray:
+        """Load an image as an RGB(A) uint8 array without touching disk for in-memory input."""
+        if isinstance(image, np.ndarray):
+            return image
+        
+        if isinstance(image, Image.Image):
+            if image.mode not in ['RGB', 'RGBA']:
+                image = image.convert('RGB')
+            return np.array(image)
+        
+        # Encoded files go through OpenCV's native decoders, which produce a
+        # contiguous array in a single copy
+        if isinstance(image, str):
+            data = np.fromfile(image, dtype=np.uint8)
+        else:
+            data = np.frombuffer(image, dtype=np.uint8)
+        
+        # Steganalysis must see the pixels in stored order, so leave EXIF
+        # orientation unapplied, as Pillow does
+        bgr = cv2.imdecode(data, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+        if bgr is None:
+            # OpenCV has no decoder for some formats Pillow reads (GIF among them)
+            try:
+                return self._load_image(Image.open(io.BytesIO(data)))
+            except Exception as e:
+                raise ValueError("Unable to decode image") from e
+        
+        # OpenCV decodes to BGR; reverse the channel axis (a view) to label R, G, B correctly
+        return bgr[..., ::-1]
+    
+    def _downsample(self, img_array: np.ndarray) -> np.ndarray:
+        """Subsample every k-th row and column so at most MAX_ANALYSIS_PIXELS remain."""
+        height, width = img_array.shape[:2]
+        step = max(1, math.ceil(math.sqrt(height * width / self.MAX_ANALYSIS_PIXELS)))
+        if step == 1:
+            return img_array
+        return img_array[::step, ::step]
+    
+    def _split_channels(self, img_array: np.ndarray) -> np.ndarray:
+        """Return the RGB channels as a C-contiguous uint8 (3, H, W) array."""
+        return np.ascontiguousarray(img_array[..., :3].transpose(2, 0, 1), dtype=np.uint8)
     
-    def _chi_square_test(self, img_array: np.ndarray) -> Dict[str, float]:
+    def _extract_bitplanes(self, channels: np.ndarray, count: int = 8) -> np.ndarray:
+        """
+        Extract the lowest `count` bit-planes of (3, H, W) channels in one sweep.
+        Returns a C-contiguous uint8 array of shape (3, count, H, W).
+        """
+        bits = np.arange(count, dtype=np.uint8)[:, None, None]
+        # Shift into a fresh uint8 array and mask it in place: one read of the
+        # channels, one write of the planes, with no widening or extra copy
+        planes = channels[:, None] >> bits
+        planes &= np.uint8(1)
+        return planes
+    
+    def _chi_square_test(self, img_array: np.ndarray, bitplanes: Optional[np.ndarray] = None) -> Dict[str, float]:
         """
         Perform chi-square test on LSB distribution.
         Tests for unnatural distribution of LSB values.
         """
+        if bitplanes is None:
+            bitplanes = self._extract_bitplanes(self._split_channels(img_array), 1)
+        
+        # Count LSB values (0 and 1) for all channels in a single pass
+        lsb_values = bitplanes[:, 0]
+        total_pixels = lsb_values.shape[1] * lsb_values.shape[2]
+        return self._chi_square_from_counts(count_ones(lsb_values), total_pixels)
+    
+    def _chi_square_from_counts(self, ones: np.ndarray, total_pixels: int) -> Dict[str, float]:
+        """Chi-square results from the per-channel count of set LSBs."""
         results = {}
+        zeros = total_pixels - ones
+        
+        # Expected frequency (should be roughly equal)
+        expected = total_pixels / 2
+        
+        # Chi-square test with two bins (1 degree of freedom), in closed form
+        # for all channels at once
+        observed = np.stack([zeros, ones], axis=1)
+        chi2_stats = ((observed - expected) ** 2 / expected).sum(axis=1)
+        p_values = stats.chi2.sf(chi2_stats, df=1)
         
         for channel_idx, channel_name in enumerate(['red', 'green', 'blue']):
-            channel_data = img_array[:, :, channel_idx]
-            
-            # Count LSB values (0 and 1)
-            lsb_values = channel_data & 1
-            observed = np.bincount(lsb_values.flatten(), minlength=2)
-            
-            # Expected frequency (should be roughly equal)
-            total_pixels = len(lsb_values.flatten())
-            expected = np.array([total_pixels / 2, total_pixels / 2])
-            
-            # Chi-square test
-            chi2_stat, p_value = stats.chisquare(observed, expected)
+            chi2_stat = chi2_stats[channel_idx]
+            p_value = p_values[channel_idx]
 
             # Calculate deviation from expected
-            deviation = abs(observed[0] - observed[1]) / total_pixels
+            deviation = abs(zeros[channel_idx] - ones[channel_idx]) / total_pixels
 
             suspicious_bool = bool((float(p_value) < 0.05) and (float(deviation) > 0.1))
 
@@ -105,155 +350,201 @@ class SteganalysisEngine:
         
         return results
     
-    def _rs_analysis(self, img_array: np.ndarray) -> Dict[str, float]:
+    def _rs_analysis(self, img_array: np.ndarray, channels: Optional[np.ndarray] = None) -> Dict[str, float]:
         """
         Simplified RS analysis for detecting LSB steganography.
         Analyzes sample pairs and their relationships.
         """
+        if channels is None:
+            channels = self._split_channels(img_array)
+        
+        total_pairs = channels.shape[1] * max(channels.shape[2] - 1, 0)
+        
+        if numba is not None:
+            # Single fused sweep per channel, parallel over rows
+            regular_pairs = np.array([rs_stats(channel)[0] for channel in channels])
+        else:
+            # Create sample pairs (horizontal neighbors) for all channels at once.
+            # |x - y| stays in uint8 as max - min, so no widened copies are made
+            left = channels[:, :, :-1]
+            right = channels[:, :, 1:]
+            diff = np.maximum(left, right)
+            diff -= np.minimum(left, right)
+            
+            # Calculate RS statistics (simplified RS logic), one count per channel;
+            # every pair is either regular (|x - y| <= 1) or singular
+            regular_pairs = np.count_nonzero(diff <= 1, axis=(1, 2))
+        
+        return self._rs_from_counts(regular_pairs, total_pairs)
+    
+    def _rs_from_counts(self, regular_pairs: np.ndarray, total_pairs: int) -> Dict[str, float]:
+        """RS results from the per-channel count of regular pairs."""
         results = {}
+        # Every pair is either regular or singular
+        singular_pairs = total_pairs - regular_pairs
         
         for channel_idx, channel_name in enumerate(['red', 'green', 'blue']):
-            channel_data = img_array[:, :, channel_idx].astype(np.float32)
-            
-            # Create sample pairs (horizontal neighbors)
-            pairs = []
-            for i in range(channel_data.shape[0]):
-                for j in range(channel_data.shape[1] - 1):
-                    pairs.append((channel_data[i, j], channel_data[i, j + 1]))
-            
-            # Calculate RS statistics
-            regular_pairs = 0
-            singular_pairs = 0
-            
-            for x, y in pairs:
-                # Simplified RS logic
-                if abs(x - y) <= 1:
-                    regular_pairs += 1
-                elif abs(x - y) >= 2:
-                    singular_pairs += 1
-            
-            total_pairs = len(pairs)
             if total_pairs > 0:
-                rs_ratio = regular_pairs / total_pairs
+                rs_ratio = regular_pairs[channel_idx] / total_pairs
                 rs_score = abs(rs_ratio - 0.5)  # Deviation from expected 0.5
             else:
                 rs_score = 0.0
             
             results[channel_name] = {
                 "rs_score": float(rs_score),
-                "regular_pairs": int(regular_pairs),
-                "singular_pairs": int(singular_pairs),
+                "regular_pairs": int(regular_pairs[channel_idx]),
+                "singular_pairs": int(singular_pairs[channel_idx]),
                 "suspicious": bool(rs_score > 0.1)
             }
         
         return results
     
-    def _bitplane_analysis(self, img_array: np.ndarray) -> Dict[str, Any]:
+    def _bitplane_analysis(self, img_array: np.ndarray, bitplanes: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """
         Analyze bit-planes for steganographic artifacts.
         """
+        if bitplanes is None:
+            bitplanes = self._extract_bitplanes(self._split_channels(img_array), 2)
+        
+        # Analyze LSB plane (bit 0) for noise patterns
+        lsb_plane = bitplanes[:, 0]
+        num_channels = lsb_plane.shape[0]
+        
+        # Calculate noise variance in blocks
+        block_size = 8
+        if numba is not None:
+            noise_variances = np.stack([block_variance_stats(plane, block_size) for plane in lsb_plane])
+        else:
+            # Crop to whole blocks, then walk bands of block rows small enough
+            # to stay in cache between the tile reshape and the reduction
+            block_rows = lsb_plane.shape[1] // block_size
+            block_cols = lsb_plane.shape[2] // block_size
+            cropped = lsb_plane[:, :block_rows * block_size, :block_cols * block_size]
+            band_bytes = num_channels * block_size * max(cropped.shape[2], 1)
+            band_block_rows = max(1, self.VARIANCE_TILE_BYTES // band_bytes)
+            
+            bands = [np.empty((num_channels, 0))]
+            for top in range(0, block_rows, band_block_rows):
+                rows = min(band_block_rows, block_rows - top)
+                band = cropped[:, top * block_size:(top + rows) * block_size]
+                # View the band as a (channel, rows, block, cols, block) tile grid
+                blocks = band.reshape(num_channels, rows, block_size, block_cols, block_size)
+                bands.append(blocks.var(axis=(2, 4)).reshape(num_channels, -1))
+            noise_variances = np.concatenate(bands, axis=1)
+        
+        # Compare with higher bit-planes
+        higher_bit_variance = bitplanes[:, 1].var(axis=(1, 2))
+        
+        return self._bitplane_from_variances(noise_variances, higher_bit_variance)
+    
+    def _bitplane_from_variances(self, noise_variances: np.ndarray, higher_bit_variance: np.ndarray) -> Dict[str, Any]:
+        """Bit-plane results from per-block LSB variances and the bit-1 plane variance."""
         results = {}
         
+        # Calculate statistics per channel
+        mean_variance = noise_variances.mean(axis=1)
+        std_variance = noise_variances.std(axis=1)
+        
         for channel_idx, channel_name in enumerate(['red', 'green', 'blue']):
-            channel_data = img_array[:, :, channel_idx]
-            
-            # Extract bit-planes
-            bitplanes = []
-            for bit in range(8):
-                bitplane = (channel_data >> bit) & 1
-                bitplanes.append(bitplane)
-            
-            # Analyze LSB plane (bit 0) for noise patterns
-            lsb_plane = bitplanes[0]
-            
-            # Calculate noise variance in blocks
-            block_size = 8
-            noise_variances = []
-            
-            for i in range(0, lsb_plane.shape[0] - block_size, block_size):
-                for j in range(0, lsb_plane.shape[1] - block_size, block_size):
-                    block = lsb_plane[i:i+block_size, j:j+block_size]
-                    variance = np.var(block.astype(np.float32))
-                    noise_variances.append(variance)
-            
-            # Calculate statistics
-            mean_variance = np.mean(noise_variances)
-            std_variance = np.std(noise_variances)
-            
-            # Compare with higher bit-planes
-            higher_bit_variance = np.var(bitplanes[1].astype(np.float32))
-            
             # Suspicious if LSB variance is significantly different
-            variance_ratio = mean_variance / (higher_bit_variance + 1e-6)
+            variance_ratio = mean_variance[channel_idx] / (higher_bit_variance[channel_idx] + 1e-6)
             
             results[channel_name] = {
-                "lsb_variance": float(mean_variance),
-                "lsb_std": float(std_variance),
-                "higher_bit_variance": float(higher_bit_variance),
+                "lsb_variance": float(mean_variance[channel_idx]),
+                "lsb_std": float(std_variance[channel_idx]),
+                "higher_bit_variance": float(higher_bit_variance[channel_idx]),
                 "variance_ratio": float(variance_ratio),
                 "suspicious": bool((float(variance_ratio) > 2.0) or (float(variance_ratio) < 0.5))
             }
         
         return results
     
-    def _generate_visualizations(self, img_array: np.ndarray) -> Dict[str, str]:
+    def _generate_visualizations(self, img_array: np.ndarray, bitplanes: Optional[np.ndarray] = None) -> Dict[str, str]:
         """Generate visualization images for analysis."""
         visualizations = {}
+        if bitplanes is None:
+            bitplanes = self._extract_bitplanes(self._split_channels(img_array), 8)
         
-        # Generate bit-plane visualizations
+        # Generate bit-plane visualizations: a 2x4 mosaic of bits 0-7 per channel
         for channel_idx, channel_name in enumerate(['red', 'green', 'blue']):
-            channel_data = img_array[:, :, channel_idx]
-            
-            # Create bit-plane grid
-            fig, axes = plt.subplots(2, 4, figsize=(12, 6))
-            fig.suptitle(f'{channel_name.upper()} Channel Bit-Planes', fontsize=14)
+            height, width = bitplanes.shape[2:]
             
-            for bit in range(8):
-                row = bit // 4
-                col = bit % 4
-                
-                bitplane = (channel_data >> bit) & 1
-                axes[row, col].imshow(bitplane, cmap='gray')
-                axes[row, col].set_title(f'Bit {bit}')
-                axes[row, col].axis('off')
+            planes = bitplanes[channel_idx] * np.uint8(255)
+            mosaic = planes.reshape(2, 4, height, width).transpose(0, 2, 1, 3).reshape(2 * height, 4 * width)
             
             # Convert to base64
             buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
-            buffer.seek(0)
-            bitplane_b64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            visualizations[f'{channel_name}_bitplanes'] = bitplane_b64
-            plt.close(fig)
+            Image.fromarray(mosaic, 'L').save(buffer, format='PNG', optimize=False, compress_level=1)
+            visualizations[f'{channel_name}_bitplanes'] = base64.b64encode(buffer.getvalue()).decode('utf-8')
         
-        # Generate LSB histogram
-        fig, axes = plt.subplots(1, 3, figsize=(15, 5))
-        fig.suptitle('LSB Distribution Analysis', fontsize=14)
+        # Count LSB values
+        lsb_values = bitplanes[:, 0]
+        pixels = lsb_values.shape[1] * lsb_values.shape[2]
+        ones = count_ones(lsb_values)
         
-        for channel_idx, channel_name in enumerate(['red', 'green', 'blue']):
-            channel_data = img_array[:, :, channel_idx]
-            lsb_values = channel_data & 1
-            
-            # Count LSB values
-            counts = np.bincount(lsb_values.flatten(), minlength=2)
-            axes[channel_idx].bar(['0', '1'], counts, color=['red', 'blue'])
-            axes[channel_idx].set_title(f'{channel_name.upper()} Channel LSB Distribution')
-            axes[channel_idx].set_ylabel('Count')
+        # Generate LSB histogram on the shared figure
+        with self._histogram_lock:
+            for channel_idx, channel_name in enumerate(['red', 'green', 'blue']):
+                ax = self._histogram_axes[channel_idx]
+                ax.clear()
+                
+                counts = np.array([pixels - ones[channel_idx], ones[channel_idx]])
+                ax.bar(['0', '1'], counts, color=['red', 'blue'])
+                ax.set_title(f'{channel_name.upper()} Channel LSB Distribution')
+                ax.set_ylabel('Count')
+                
+                # Add expected line
+                expected = pixels / 2
+                ax.axhline(y=expected, color='green', linestyle='--',
+                           label=f'Expected: {expected:.0f}')
+                ax.legend()
             
-            # Add expected line
-            expected = len(lsb_values.flatten()) / 2
-            axes[channel_idx].axhline(y=expected, color='green', linestyle='--', 
-                                    label=f'Expected: {expected:.0f}')
-            axes[channel_idx].legend()
+            # Convert to base64
+            visualizations['lsb_histogram'] = self._figure_to_base64(self._histogram_fig, dpi=self.HISTOGRAM_DPI)
+        
+        return visualizations
+    
+    def _figure_to_base64(self, fig, dpi: int) -> str:
+        """Rasterize a figure with the Agg canvas and encode it as base64 PNG via Pillow."""
+        fig.set_dpi(dpi)
+        fig.canvas.draw()
+        rgba = np.asarray(fig.canvas.buffer_rgba())
         
-        # Convert to base64
         buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
-        buffer.seek(0)
-        histogram_b64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        visualizations['lsb_histogram'] = histogram_b64
-        plt.close(fig)
+        Image.fromarray(rgba, 'RGBA').save(buffer, format='PNG')
+        return base64.b64encode(buffer.getvalue()).decode('utf-8')
+    
+    def _fused_analysis(self, channels: np.ndarray) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+        """
+        Run all three detectors from a single pass of the Numba analysis kernel.
+        Returns the chi-square, RS and bit-plane results.
+        """
+        height, width = channels.shape[1:]
+        total_pixels = height * width
+        lsb_ones, bit1_ones, regular_pairs, noise_variances = analysis_stats(channels, 8)
         
-        return visualizations
+        # A 0/1 plane set with frequency p has variance p * (1 - p)
+        bit1_share = bit1_ones / total_pixels
+        higher_bit_variance = bit1_share * (1 - bit1_share)
+        
+        return (self._chi_square_from_counts(lsb_ones, total_pixels),
+                self._rs_from_counts(regular_pairs, height * max(width - 1, 0)),
+                self._bitplane_from_variances(noise_variances, higher_bit_variance))
+    
+    def _analyze_all(self, img_array: np.ndarray) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+        """
+        Run all three detectors on an image, splitting the channels once. Uses
+        the fused Numba pass when available. Returns the chi-square, RS and
+        bit-plane results.
+        """
+        channels = self._split_channels(img_array)
+        if numba is not None:
+            return self._fused_analysis(channels)
+        
+        bitplanes = self._extract_bitplanes(channels, 2)
+        return (self._chi_square_test(img_array, bitplanes),
+                self._rs_analysis(img_array, channels),
+                self._bitplane_analysis(img_array, bitplanes))
     
     def _calculate_confidence(self, 
                             chi_square_results: Dict[str, Any], 
@@ -5,11 +5,9 @@ Main FastAPI application entry point.
 
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, ORJSONResponse
 import uvicorn
 import os
-import tempfile
-import shutil
 from typing import Optional, List
 import json
 
@@ -20,7 +18,9 @@ from models import EmbedRequest, ExtractRequest, AnalysisResult
 app = FastAPI(
     title="StegoLab API",
     description="LSB Steganography & Anti-Steganography Web Application",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson serializes the large base64 visualization strings far faster
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware for frontend communication
@@ -50,15 +50,6 @@ app.add_middleware(
 stego_engine = SteganographyEngine()
 analysis_engine = SteganalysisEngine()
 
-# Temporary directory for file processing
-TEMP_DIR = tempfile.mkdtemp()
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Clean up temporary files on shutdown."""
-    if os.path.exists(TEMP_DIR):
-        shutil.rmtree(TEMP_DIR)
-
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -68,7 +59,9 @@ async def root():
         "endpoints": {
             "embed": "/api/embed",
             "extract": "/api/extract", 
+            "capacity": "/api/capacity",
             "analyze": "/api/analyze",
+            "analyze_visualizations": "/api/analyze/visualizations",
             "demo_images": "/api/demo-images"
         }
     }
@@ -81,7 +74,8 @@ async def embed_data(
     bits: int = Form(1),
     channels: str = Form("auto"),
     password: Optional[str] = Form(None),
-    encrypt: bool = Form(False)
+    encrypt: bool = Form(False),
+    compute_metrics: bool = Form(True)
 ):
     """
     Embed data into an image using LSB steganography.
@@ -94,6 +88,7 @@ async def embed_data(
         channels: Channels to use ("red", "green", "blue", "auto")
         password: Optional password for permutation/encryption
         encrypt: Whether to encrypt the payload
+        compute_metrics: Whether to compute PSNR/SSIM (null when skipped)
     
     Returns:
         JSON with stego image data and metrics
@@ -110,10 +105,8 @@ async def embed_data(
         if not carrier_image.filename.lower().endswith(('.png', '.bmp')):
             raise HTTPException(status_code=400, detail="Only PNG and BMP images are supported for LSB embedding")
         
-        # Save uploaded files temporarily
-        carrier_path = os.path.join(TEMP_DIR, f"carrier_{carrier_image.filename}")
-        with open(carrier_path, "wb") as buffer:
-            shutil.copyfileobj(carrier_image.file, buffer)
+        # Read uploaded carrier into memory
+        carrier_data = await carrier_image.read()
         
         # Process payload
         payload_data = None
@@ -131,23 +124,18 @@ async def embed_data(
         
         # Perform embedding
         result = stego_engine.embed(
-            carrier_path=carrier_path,
+            carrier=carrier_data,
             payload_data=payload_data,
             bits=bits,
             channels=channel_list,
             password=password,
-            encrypt=encrypt
+            encrypt=encrypt,
+            compute_metrics=compute_metrics
         )
         
-        # Clean up carrier file
-        os.remove(carrier_path)
-        
         return result
         
     except Exception as e:
-        # Clean up on error
-        if 'carrier_path' in locals() and os.path.exists(carrier_path):
-            os.remove(carrier_path)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/extract")
@@ -179,29 +167,63 @@ async def extract_data(
         else:
             channel_list = [channels]
         
-        # Save uploaded image temporarily
-        image_path = os.path.join(TEMP_DIR, f"stego_{image.filename}")
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+        # Read uploaded image into memory
+        image_data = await image.read()
         
         # Perform extraction
         result = stego_engine.extract(
-            stego_path=image_path,
+            stego=image_data,
             bits=bits,
             channels=channel_list,
             password=password,
             encrypt=encrypt
         )
         
-        # Clean up
-        os.remove(image_path)
-        
         return result
         
     except Exception as e:
-        # Clean up on error
-        if 'image_path' in locals() and os.path.exists(image_path):
-            os.remove(image_path)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/capacity")
+async def get_capacity(
+    image: UploadFile = File(...),
+    bits: int = Form(1),
+    channels: str = Form("auto")
+):
+    """
+    Report the payload capacity of a carrier image without decoding it.
+    
+    Args:
+        image: The cover image (PNG/BMP)
+        bits: Number of LSBs to use (1 or 2)
+        channels: Channels to use ("red", "green", "blue", "auto")
+    
+    Returns:
+        Image dimensions and capacity in bytes
+    """
+    try:
+        if bits not in [1, 2]:
+            raise HTTPException(status_code=400, detail="bits must be 1 or 2")
+        
+        # Validate image format
+        if not image.filename.lower().endswith(('.png', '.bmp')):
+            raise HTTPException(status_code=400, detail="Only PNG and BMP images are supported for LSB embedding")
+        
+        num_channels = 3 if channels == "auto" else 1
+        
+        # Only the header is needed for the dimensions
+        image_data = await image.read()
+        width, height = stego_engine.read_dimensions(image_data)
+        capacity = stego_engine.capacity_from_dims(width, height, bits, num_channels)
+        
+        return {"width": width, "height": height, "capacity_bytes": capacity}
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        # The upload is not a readable image
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/analyze")
@@ -213,27 +235,43 @@ async def analyze_image(image: UploadFile = File(...)):
         image: The image to analyze
     
     Returns:
-        Analysis results with confidence score and visualizations
+        Analysis results with confidence score (visualizations are served
+        separately by /api/analyze/visualizations)
     """
     try:
-        # Save uploaded image temporarily
-        image_path = os.path.join(TEMP_DIR, f"analyze_{image.filename}")
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+        # Read uploaded image into memory
+        image_data = await image.read()
 
         # Perform analysis
-        result = analysis_engine.analyze(image_path)
-
-        # Clean up
-        os.remove(image_path)
+        result = analysis_engine.analyze(image_data)
 
         # Ensure frontend status rendering works
         return {"success": True, **result}
 
     except Exception as e:
-        # Clean up on error
-        if 'image_path' in locals() and os.path.exists(image_path):
-            os.remove(image_path)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/analyze/visualizations")
+async def analyze_visualizations(image: UploadFile = File(...)):
+    """
+    Render bit-plane and LSB histogram visualizations for an image.
+    
+    Args:
+        image: The image to visualize
+    
+    Returns:
+        Base64 encoded PNG visualizations
+    """
+    try:
+        # Read uploaded image into memory
+        image_data = await image.read()
+
+        # Render visualizations
+        visualizations = analysis_engine.visualize(image_data)
+
+        return {"success": True, "visualizations": visualizations}
+
+    except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/demo-images")
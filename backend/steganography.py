@@ -3,18 +3,141 @@ Core LSB steganography implementation for StegoLab.
 Handles embedding and extraction of data in images using LSB substitution.
 """
 
+import io
 import os
 import struct
 import hashlib
-import random
 import base64
-from typing import List, Optional, Dict, Any, Tuple
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, List, Optional, Dict, Any, Tuple, Union
 from PIL import Image
 import numpy as np
-from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-import zlib
+
+try:
+    from isal.isal_zlib import crc32 as _crc32  # ISA-L's carry-less-multiply CRC32
+except ImportError:  # python-isal is optional; zlib computes the same checksum
+    from zlib import crc32 as _crc32
+
+try:
+    import numba
+except ImportError:  # Numba is optional; the NumPy code paths are used instead
+    numba = None
+
+try:
+    import imagecodecs
+except ImportError:  # imagecodecs is optional; Pillow handles PNG I/O instead
+    imagecodecs = None
+
+
+if numba is not None:
+    @numba.njit
+    def embed_kernel(flat: np.ndarray, positions: np.ndarray, data: np.ndarray, bits: int) -> None:
+        """Write `data` MSB first, `bits` bits per position, into the LSBs of flat[positions]."""
+        total_bits = data.size * 8
+        keep_mask = np.uint8(0xFF ^ ((1 << bits) - 1))
+        num_groups = min(positions.size, (total_bits + bits - 1) // bits)
+
+        # Assemble every position's value into a preallocated buffer first, so
+        # the scattered read-modify-writes below run back to back
+        vals = np.empty(num_groups, dtype=np.uint8)
+        for k in range(num_groups):
+            val = 0
+            for j in range(bits):
+                bit_ptr = k * bits + j
+                bit = 0
+                if bit_ptr < total_bits:
+                    bit = (data[bit_ptr >> 3] >> (7 - (bit_ptr & 7))) & 1
+                val = (val << 1) | bit
+            vals[k] = val
+
+        for k in range(num_groups):
+            position = positions[k]
+            flat[position] = (flat[position] & keep_mask) | vals[k]
+
+    @numba.njit
+    def extract_kernel(flat: np.ndarray, positions: np.ndarray, bits: int, length_bytes: int) -> np.ndarray:
+        """Read `length_bytes` bytes, MSB first, from the LSBs of flat[positions]."""
+        total_bits = length_bytes * 8
+        bit_mask = (1 << bits) - 1
+        num_groups = min(positions.size, (total_bits + bits - 1) // bits)
+        available_bits = min(num_groups * bits, total_bits)
+
+        # Gather the samples into a preallocated buffer first; independent
+        # loads overlap far better than ones interleaved with the bit packing
+        vals = np.empty(num_groups, dtype=np.uint8)
+        for k in range(num_groups):
+            vals[k] = flat[positions[k]]
+
+        # Shift bits into a byte accumulator and store each byte once it fills
+        out = np.empty((available_bits + 7) // 8, dtype=np.uint8)
+        acc = 0
+        taken = 0
+        for k in range(num_groups):
+            val = vals[k] & bit_mask
+            for j in range(bits - 1, -1, -1):
+                if taken == available_bits:
+                    break
+                acc = (acc << 1) | ((val >> j) & 1)
+                taken += 1
+                if taken & 7 == 0:
+                    out[(taken >> 3) - 1] = acc
+                    acc = 0
+
+        # Fewer positions than bits requested leave a zero-padded last byte
+        if taken & 7:
+            out[taken >> 3] = acc << (8 - (taken & 7))
+        return out
+
+    # Compile up front so the first request doesn't pay for it
+    _warmup = np.zeros(16, dtype=np.uint8)
+    embed_kernel(_warmup, np.arange(8, dtype=np.int64), _warmup[:1], 1)
+    _warmup.setflags(write=False)  # extract reads read-only image views
+    extract_kernel(_warmup, np.arange(8, dtype=np.int64), 1, 1)
+    del _warmup
+
+
+# Recently derived keys, indexed by a BLAKE2b digest of (salt, password) keyed
+# with a per-process secret, so no plaintext password is retained and the
+# digests cannot be brute-forced offline
+_KEY_CACHE_SIZE = 32
+_key_cache_secret = os.urandom(32)
+_key_cache: OrderedDict = OrderedDict()
+_key_cache_lock = threading.Lock()
+
+
+def _derive_key(password: str, salt: bytes) -> bytes:
+    """Derive the 32-byte AES key for a password and salt (PBKDF2, 100k rounds)."""
+    cache_key = hashlib.blake2b(salt + password.encode(), key=_key_cache_secret).digest()
+    with _key_cache_lock:
+        key = _key_cache.pop(cache_key, None)
+    
+    if key is None:
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=100000,
+        )
+        key = kdf.derive(password.encode())
+    
+    # Most recently used entries live at the end
+    with _key_cache_lock:
+        _key_cache[cache_key] = key
+        while len(_key_cache) > _KEY_CACHE_SIZE:
+            _key_cache.popitem(last=False)
+    return key
+
+
+# Embedding positions: linear sample indices, or one contiguous run of them
+Positions = Union[np.ndarray, slice]
+
+# Image input: a path, the encoded file's bytes, or a file-like object holding them
+ImageInput = Union[str, bytes, BinaryIO]
+
 
 class SteganographyEngine:
     """
@@ -31,26 +154,32 @@ class SteganographyEngine:
     HEADER_SIZE = 16
     MAGIC_BYTES = b'STEG'
     
+    PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+    
     def __init__(self):
         self.max_file_size = 5 * 1024 * 1024  # 5MB limit
+        # tuple of channel names -> read-only int64 array of channel indices
+        self._channel_cache: Dict[Tuple[str, ...], np.ndarray] = {}
     
     def embed(self, 
-              carrier_path: str, 
+              carrier: ImageInput, 
               payload_data: bytes, 
               bits: int = 1, 
               channels: List[str] = None,
               password: Optional[str] = None,
-              encrypt: bool = False) -> Dict[str, Any]:
+              encrypt: bool = False,
+              compute_metrics: bool = True) -> Dict[str, Any]:
         """
         Embed payload data into carrier image using LSB steganography.
         
         Args:
-            carrier_path: Path to carrier image
+            carrier: Path to carrier image, its encoded bytes, or a file-like object holding them
             payload_data: Data to embed
             bits: Number of LSBs to use (1 or 2)
             channels: List of channels to use ['red', 'green', 'blue']
             password: Optional password for permutation/encryption
             encrypt: Whether to encrypt payload before embedding
+            compute_metrics: Whether to compute PSNR/SSIM (None when skipped)
             
         Returns:
             Dictionary with stego image data and metrics
@@ -58,28 +187,23 @@ class SteganographyEngine:
         if channels is None:
             channels = ['red', 'green', 'blue']
         
-        # Load and validate carrier image
-        carrier_img = Image.open(carrier_path)
-        if carrier_img.mode not in ['RGB', 'RGBA']:
-            carrier_img = carrier_img.convert('RGB')
+        # Load and validate carrier image (a writable copy, since embedding
+        # modifies it in place)
+        img_array = self._load_image_array(carrier, writable=True)
         
         # Calculate capacity
-        capacity = self._calculate_capacity(carrier_img, bits, len(channels))
+        capacity = self._calculate_capacity(img_array, bits, len(channels))
         if len(payload_data) > capacity:
             raise ValueError(f"Payload too large: {len(payload_data)} bytes > {capacity} bytes capacity")
         
         # Prepare payload (optionally encrypted) with header
         if encrypt and password:
             encrypted_payload = self._encrypt_payload(payload_data, password)
-            crc_plain = zlib.crc32(payload_data) & 0xffffffff
+            crc_plain = _crc32(payload_data) & 0xffffffff
             payload_with_header = self._create_payload_with_header(encrypted_payload, plaintext_crc32=crc_plain)
         else:
             payload_with_header = self._create_payload_with_header(payload_data)
         
-        # Convert image to numpy array
-        img_array = np.array(carrier_img)
-        original_array = img_array.copy()
-        
         # Determine channel indices
         selected_channels = self._get_channel_indices(channels)
 
@@ -92,25 +216,24 @@ class SteganographyEngine:
             img_array.shape, positions_needed, password, selected_channels, start_index=0
         )
         
+        # Keep the original values of just the samples about to change
+        if compute_metrics:
+            original_values = img_array.reshape(-1)[positions]
+            if isinstance(positions, slice):
+                # Slicing gives a view, which embedding would overwrite
+                original_values = original_values.copy()
+        
         # Embed data
         self._embed_data(img_array, payload_with_header, positions, bits)
         
-        # Create stego image
-        stego_img = Image.fromarray(img_array)
-        
         # Calculate metrics
-        metrics = self._calculate_metrics(original_array, img_array)
-        
-        # Save stego image to temporary file
-        stego_path = os.path.join(os.path.dirname(carrier_path), "stego_temp.png")
-        stego_img.save(stego_path, "PNG")
-        
-        # Read stego image as base64
-        with open(stego_path, "rb") as f:
-            stego_base64 = base64.b64encode(f.read()).decode('utf-8')
+        if compute_metrics:
+            metrics = self._calculate_metrics(img_array, positions, original_values)
+        else:
+            metrics = {"psnr": None, "ssim": None}
         
-        # Clean up
-        os.remove(stego_path)
+        # Encode stego image as PNG in memory and return it as base64
+        stego_base64 = base64.b64encode(self._encode_png(img_array)).decode('utf-8')
         
         return {
             "success": True,
@@ -127,7 +250,7 @@ class SteganographyEngine:
         }
     
     def extract(self, 
-                stego_path: str, 
+                stego: ImageInput, 
                 bits: int = 1, 
                 channels: List[str] = None,
                 password: Optional[str] = None,
@@ -136,7 +259,7 @@ class SteganographyEngine:
         Extract payload data from stego image.
         
         Args:
-            stego_path: Path to stego image
+            stego: Path to stego image, its encoded bytes, or a file-like object holding them
             bits: Number of LSBs used
             channels: List of channels used
             password: Password used during embedding
@@ -149,34 +272,41 @@ class SteganographyEngine:
             channels = ['red', 'green', 'blue']
         selected_channels = self._get_channel_indices(channels)
         
-        # Load stego image
-        stego_img = Image.open(stego_path)
-        if stego_img.mode not in ['RGB', 'RGBA']:
-            stego_img = stego_img.convert('RGB')
-        
-        img_array = np.array(stego_img)
+        # Load stego image (extraction only reads pixels, so a read-only
+        # view is enough)
+        img_array = self._load_image_array(stego, writable=False)
         
         # Extract header first
         header_bits = self.HEADER_SIZE * 8
         header_positions_needed = (header_bits + bits - 1) // bits
+        # The header and payload passes walk one password permutation; its
+        # keys are built once and dropped when this call returns
+        slot_keys = None
+        if password:
+            height, width = img_array.shape[:2]
+            slot_keys = self._slot_keys(password, height * width * len(selected_channels))
+        
         header_positions = self._generate_embedding_positions(
-            img_array.shape, header_positions_needed, password, selected_channels, start_index=0
+            img_array.shape, header_positions_needed, password, selected_channels,
+            start_index=0, slot_keys=slot_keys
         )
         
         header_data = self._extract_data(img_array, header_positions, bits, self.HEADER_SIZE)
         
-        # Validate header
-        if not self._validate_header(header_data):
+        # Validate header (magic only; the fields are read by slicing below)
+        if header_data[:4] != self.MAGIC_BYTES:
             raise ValueError("Invalid stego image: header not found or corrupted")
         
-        # Parse header
-        magic, payload_length, crc32, _ = struct.unpack('>4sIII', header_data)
+        # Parse header: big-endian payload length and CRC32 after the magic
+        payload_length = int.from_bytes(header_data[4:8], 'big')
+        crc32 = int.from_bytes(header_data[8:12], 'big')
         
         # Extract payload
         payload_bits = payload_length * 8
         payload_positions_needed = (payload_bits + bits - 1) // bits
         payload_positions = self._generate_embedding_positions(
-            img_array.shape, payload_positions_needed, password, selected_channels, start_index=header_positions_needed
+            img_array.shape, payload_positions_needed, password, selected_channels,
+            start_index=header_positions_needed, slot_keys=slot_keys
         )
         
         payload_data = self._extract_data(img_array, payload_positions, bits, payload_length)
@@ -186,7 +316,7 @@ class SteganographyEngine:
             payload_data = self._decrypt_payload(payload_data, password)
         
         # Verify CRC32
-        if zlib.crc32(payload_data) != crc32:
+        if _crc32(payload_data) != crc32:
             raise ValueError("Payload corruption detected: CRC32 mismatch")
         
         # Try to decode as text, otherwise return as binary
@@ -206,183 +336,384 @@ class SteganographyEngine:
                 "payload_type": "binary"
             }
     
-    def _calculate_capacity(self, img: Image.Image, bits: int, num_channels: int) -> int:
-        """Calculate maximum payload capacity in bytes."""
-        width, height = img.size
-        pixels = width * height
-        bits_per_pixel = bits * num_channels
-        total_bits = pixels * bits_per_pixel
+    def _load_image_array(self, source: ImageInput, writable: bool) -> np.ndarray:
+        """
+        Decode an image to a uint8 (H, W, 3|4) array. 8-bit RGB/RGBA PNGs go
+        through imagecodecs when it is installed; everything else is decoded by
+        Pillow, converting modes other than RGB/RGBA to RGB.
+        """
+        if imagecodecs is not None:
+            if isinstance(source, str):
+                with open(source, 'rb') as f:
+                    data = f.read()
+            elif isinstance(source, bytes):
+                data = source
+            else:
+                data = source.read()
+            
+            if self._is_plain_png(data):
+                return imagecodecs.png_decode(data)
+            source = io.BytesIO(data)
+        elif isinstance(source, bytes):
+            source = io.BytesIO(source)
+        
+        img = Image.open(source)
+        if img.mode not in ['RGB', 'RGBA']:
+            img = img.convert('RGB')
+        
+        # np.asarray is a read-only view over Pillow's buffer; np.array copies it
+        if writable:
+            return np.array(img, dtype=np.uint8)
+        return np.asarray(img, dtype=np.uint8)
+    
+    def _is_plain_png(self, data: bytes) -> bool:
+        """
+        Whether `data` is an 8-bit RGB/RGBA PNG that imagecodecs decodes to the
+        same array as Pillow. A tRNS chunk (which must precede IDAT) makes
+        imagecodecs add an alpha channel that Pillow's RGB mode does not.
+        """
+        # IHDR bit depth and colour type sit at bytes 24 and 25; only plain
+        # 8-bit RGB (2) and RGBA (6) qualify
+        if data[:8] != self.PNG_SIGNATURE or len(data) <= 25 or data[24] != 8 or data[25] not in (2, 6):
+            return False
+        
+        # Walk the chunks (4-byte length, 4-byte type, data, 4-byte CRC) up to IDAT
+        offset = 8
+        while offset + 8 <= len(data):
+            chunk_type = data[offset + 4:offset + 8]
+            if chunk_type == b'IDAT':
+                return True
+            if chunk_type == b'tRNS':
+                return False
+            offset += 12 + int.from_bytes(data[offset:offset + 4], 'big')
+        return False
+    
+    def _encode_png(self, img_array: np.ndarray) -> bytes:
+        """Encode a uint8 RGB/RGBA array as PNG (zlib level 6)."""
+        if imagecodecs is not None:
+            return imagecodecs.png_encode(img_array, level=6)
+        
+        buffer = io.BytesIO()
+        Image.fromarray(img_array).save(buffer, "PNG", optimize=False, compress_level=6)
+        return buffer.getvalue()
+    
+    @staticmethod
+    def capacity_from_dims(width: int,
+                           height: int,
+                           bits: int,
+                           num_channels: int,
+                           header_size: int = HEADER_SIZE) -> int:
+        """Maximum payload capacity in bytes for an image of the given size."""
+        total_bits = width * height * bits * num_channels
         # Reserve space for header
-        available_bits = total_bits - (self.HEADER_SIZE * 8)
-        return available_bits // 8
+        return (total_bits - header_size * 8) // 8
+    
+    def read_dimensions(self, source: ImageInput) -> Tuple[int, int]:
+        """
+        Return (width, height) of an image without decoding its pixels. PNG
+        and BMP sizes are read straight from the first 26 header bytes; other
+        formats fall back to Image.open, which also only parses the header.
+        Raises ValueError if the dimensions cannot be read.
+        """
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return self._read_stream_dimensions(f)
+        
+        # Leave the caller's stream where it was, e.g. for a following embed()
+        position = source.tell()
+        try:
+            return self._read_stream_dimensions(source)
+        finally:
+            source.seek(position)
+    
+    def _read_stream_dimensions(self, stream: BinaryIO) -> Tuple[int, int]:
+        """read_dimensions for a binary stream positioned at the start of the image."""
+        start = stream.tell()
+        head = stream.read(26)
+        
+        # PNG: signature, then the IHDR chunk with big-endian width/height
+        if head[:8] == self.PNG_SIGNATURE and head[12:16] == b'IHDR':
+            if len(head) < 24:
+                raise ValueError("Truncated PNG header")
+            return struct.unpack('>II', head[16:24])
+        
+        # BMP: BITMAPINFOHEADER (or later) with signed little-endian width/height;
+        # a negative height marks a top-down bitmap
+        if head[:2] == b'BM' and len(head) == 26 and struct.unpack('<I', head[14:18])[0] >= 40:
+            width, height = struct.unpack('<ii', head[18:26])
+            return abs(width), abs(height)
+        
+        stream.seek(start)
+        if start:
+            # Image.open rewinds to offset 0, so give it the image bytes alone
+            stream = io.BytesIO(stream.read())
+        try:
+            with Image.open(stream) as img:
+                return img.size
+        except OSError as e:
+            # Pillow's UnidentifiedImageError is an OSError
+            raise ValueError("Unable to read image dimensions") from e
+    
+    def capacity(self, source: ImageInput, bits: int = 1, num_channels: int = 3) -> int:
+        """Payload capacity in bytes of an image, read from its header only."""
+        width, height = self.read_dimensions(source)
+        return self.capacity_from_dims(width, height, bits, num_channels)
+    
+    def _calculate_capacity(self, img: Union[Image.Image, np.ndarray], bits: int, num_channels: int) -> int:
+        """Calculate maximum payload capacity in bytes."""
+        if isinstance(img, np.ndarray):
+            height, width = img.shape[:2]
+        else:
+            width, height = img.size
+        return self.capacity_from_dims(width, height, bits, num_channels)
     
     def _create_payload_with_header(self, payload_data: bytes, plaintext_crc32: Optional[int] = None) -> bytes:
         """Create payload with header containing length and checksum.
         If plaintext_crc32 is provided, it will be used; otherwise CRC is computed over payload_data.
         """
-        crc32 = (plaintext_crc32 if plaintext_crc32 is not None else (zlib.crc32(payload_data) & 0xffffffff))
+        crc32 = (plaintext_crc32 if plaintext_crc32 is not None else (_crc32(payload_data) & 0xffffffff))
         header = struct.pack('>4sIII', self.MAGIC_BYTES, len(payload_data), crc32, 0)
         return header + payload_data
     
     def _validate_header(self, header_data: bytes) -> bool:
         """Validate stego header."""
-        if len(header_data) != self.HEADER_SIZE:
-            return False
-        magic, _, _, _ = struct.unpack('>4sIII', header_data)
-        return magic == self.MAGIC_BYTES
+        return len(header_data) == self.HEADER_SIZE and header_data[:4] == self.MAGIC_BYTES
     
     def _generate_embedding_positions(self,
                                       img_shape: Tuple[int, ...],
                                       positions_needed: int,
                                       password: Optional[str] = None,
-                                      selected_channels: Optional[List[int]] = None,
-                                      start_index: int = 0) -> List[Tuple[int, int, int]]:
-        """Generate positions for embedding/extracting. Each position corresponds to one (row,col,channel)."""
+                                      selected_channels: Optional[Union[List[int], np.ndarray]] = None,
+                                      start_index: int = 0,
+                                      slot_keys: Optional[np.ndarray] = None) -> Positions:
+        """
+        Generate positions for embedding/extracting. Each position is the linear
+        index of one (row, col, channel) sample in the flattened image array.
+        Unshuffled positions over every channel of the image are returned as a
+        slice, since they form one contiguous run. Callers making several passes
+        with one password can pass the _slot_keys they already built.
+        """
         height, width, num_channels = img_shape
         if selected_channels is None:
             selected_channels = [0, 1, 2]
 
-        # Build list of all candidate positions
-        all_positions: List[Tuple[int, int, int]] = []
-        for r in range(height):
-            for c in range(width):
-                for ch in selected_channels:
-                    all_positions.append((r, c, ch))
+        channel_offsets = np.asarray(selected_channels, dtype=np.int64)
+        total_positions = height * width * len(channel_offsets)
+        end_index = min(start_index + positions_needed, total_positions)
 
-        # Optionally shuffle with password-derived seed
+        if not password and np.array_equal(channel_offsets, np.arange(num_channels)):
+            # Slot k is then sample k of the flattened image
+            return slice(start_index, max(end_index, start_index))
+
+        # Candidates are numbered pixel-major: slot k is channel k % n of pixel k // n
         if password:
-            seed = int(hashlib.sha256(password.encode()).hexdigest()[:8], 16)
-            rng = random.Random(seed)
-            rng.shuffle(all_positions)
+            if slot_keys is None:
+                slot_keys = self._slot_keys(password, total_positions)
+            slots = self._shuffled_slots(slot_keys, end_index)[start_index:]
+        else:
+            slots = np.arange(start_index, end_index, dtype=np.int64)
 
-        end_index = start_index + positions_needed
-        return all_positions[start_index:end_index]
+        pixels, channel_slots = np.divmod(slots, len(channel_offsets))
+        return pixels * num_channels + channel_offsets[channel_slots]
+    
+    def _slot_keys(self, password: str, total_positions: int) -> np.ndarray:
+        """
+        Password-seeded sort keys for range(total_positions): random high bits
+        with the slot number in the low bits, so every key is unique and
+        ordering the keys orders the slots.
+        """
+        # 64-bit seed: BLAKE2b with an 8-byte digest
+        seed = int.from_bytes(hashlib.blake2b(password.encode(), digest_size=8).digest(), 'big')
+        rng = np.random.Generator(np.random.Philox(seed))
+        
+        slot_bits = max(1, (total_positions - 1).bit_length())
+        keys = rng.integers(0, 1 << (63 - slot_bits), total_positions, dtype=np.int64)
+        keys <<= slot_bits
+        keys |= np.arange(total_positions, dtype=np.int64)
+        return keys
+    
+    def _shuffled_slots(self, slot_keys: np.ndarray, count: int) -> np.ndarray:
+        """
+        First `count` slots of the permutation given by sorting `slot_keys`.
+        Only the `count` smallest keys are selected and sorted, so the cost
+        follows the payload size rather than the whole sort, and any prefix
+        of the result is the same however many slots are requested.
+        """
+        total_positions = len(slot_keys)
+        if count >= total_positions:
+            selected = np.sort(slot_keys)
+        elif count > 0:
+            selected = np.partition(slot_keys, count - 1)[:count]
+            selected.sort()
+        else:
+            return np.empty(0, dtype=np.int64)
+        
+        # Strip the random high bits, leaving the slot numbers
+        selected &= (1 << max(1, (total_positions - 1).bit_length())) - 1
+        return selected
+    
+    def _position_count(self, positions: Positions) -> int:
+        """Number of positions in an index array or contiguous slice."""
+        if isinstance(positions, slice):
+            return positions.stop - positions.start
+        return len(positions)
+    
+    def _first_positions(self, positions: Positions, count: int) -> Positions:
+        """The first `count` (or all, if fewer) positions, of the same kind."""
+        if isinstance(positions, slice):
+            return slice(positions.start, min(positions.stop, positions.start + count))
+        return positions[:count]
     
     def _embed_data(self,
                     img_array: np.ndarray,
                     data: bytes,
-                    positions: List[Tuple[int, int, int]],
+                    positions: Positions,
                     bits: int) -> None:
         """Embed data bits into image array at specified positions. Supports 1 or 2 bits per position."""
-        bit_mask = (1 << bits) - 1
+        if bits == 1:
+            self._embed_bits1(img_array, data, positions)
+            return
+        if numba is not None and not isinstance(positions, slice):
+            embed_kernel(img_array.reshape(-1), positions, np.frombuffer(data, dtype=np.uint8), bits)
+            return
 
-        total_bits = len(data) * 8
-        bit_ptr = 0
-
-        for (row, col, channel_idx) in positions:
-            if bit_ptr >= total_bits:
-                break
+        bit_mask = (1 << bits) - 1
 
-            # Assemble up to `bits` bits from the data stream (MSB first)
-            val = 0
-            read = 0
-            while read < bits and bit_ptr < total_bits:
-                byte_idx = bit_ptr // 8
-                bit_in_byte = 7 - (bit_ptr % 8)
-                bit = (data[byte_idx] >> bit_in_byte) & 1
-                val = (val << 1) | bit
-                bit_ptr += 1
-                read += 1
+        # Unpack the data stream (MSB first) and pad the last group with zeros
+        num_groups = min(self._position_count(positions), (len(data) * 8 + bits - 1) // bits)
+        data_bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=num_groups * bits)
 
-            # Pad remaining bits with zeros if we ran out
-            if read < bits:
-                val <<= (bits - read)
+        # Assemble each position's `bits` bits into one value
+        groups = data_bits.reshape(num_groups, bits)
+        vals = groups[:, 0].copy()
+        for j in range(1, bits):
+            vals = (vals << 1) | groups[:, j]
 
-            # Clear LSBs and embed new bits
-            img_array[row, col, channel_idx] &= ~bit_mask
-            img_array[row, col, channel_idx] |= val & bit_mask
+        # Clear LSBs and embed new bits, all positions at once (a contiguous
+        # slice is a plain vectorized store rather than a scatter)
+        flat = img_array.reshape(-1)
+        idx = self._first_positions(positions, num_groups)
+        flat[idx] = (flat[idx] & np.uint8(0xFF ^ bit_mask)) | vals
     
     def _extract_data(self,
                       img_array: np.ndarray,
-                      positions: List[Tuple[int, int, int]],
+                      positions: Positions,
                       bits: int,
                       length_bytes: int) -> bytes:
         """Extract data of given byte length from positions. Supports 1 or 2 bits per position."""
+        if bits == 1:
+            return self._extract_bits1(img_array, positions, length_bytes)
+        if numba is not None and not isinstance(positions, slice):
+            return extract_kernel(img_array.reshape(-1), positions, bits, length_bytes).tobytes()
+
         bit_mask = (1 << bits) - 1
         total_bits_needed = length_bytes * 8
-        bits_collected: List[int] = []
-
-        for (row, col, channel_idx) in positions:
-            if len(bits_collected) >= total_bits_needed:
-                break
-            pixel_value = img_array[row, col, channel_idx]
-            val = pixel_value & bit_mask
-            # Append `bits` bits (MSB first)
-            for j in range(bits - 1, -1, -1):
-                bits_collected.append((val >> j) & 1)
-                if len(bits_collected) >= total_bits_needed:
-                    break
+        num_groups = min(self._position_count(positions), (total_bits_needed + bits - 1) // bits)
+
+        # Gather the masked LSBs of every position at once
+        vals = img_array.reshape(-1)[self._first_positions(positions, num_groups)] & np.uint8(bit_mask)
+
+        # Split each value into its `bits` bits (MSB first), interleaved in order
+        bits_collected = np.empty((num_groups, bits), dtype=np.uint8)
+        for j in range(bits):
+            bits_collected[:, j] = (vals >> (bits - 1 - j)) & 1
 
         # Convert bits to bytes
-        result = bytearray()
-        for i in range(0, total_bits_needed, 8):
-            byte_val = 0
-            for j in range(8):
-                bit = bits_collected[i + j]
-                byte_val = (byte_val << 1) | bit
-            result.append(byte_val)
-        return bytes(result)
-
-    def _get_channel_indices(self, channels: List[str]) -> List[int]:
-        """Map channel names to indices."""
-        channel_map = {'red': 0, 'green': 1, 'blue': 2}
-        if not channels:
-            return [0, 1, 2]
-        return [channel_map[ch] for ch in channels if ch in channel_map]
+        return np.packbits(bits_collected.reshape(-1)[:total_bits_needed]).tobytes()
+
+    def _embed_bits1(self, img_array: np.ndarray, data: bytes, positions: Positions) -> None:
+        """Single-LSB embedding: each data bit replaces the LSB at its position, no grouping or padding."""
+        data_bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        count = min(self._position_count(positions), data_bits.size)
+        flat = img_array.reshape(-1)
+        idx = self._first_positions(positions, count)
+        flat[idx] = (flat[idx] & np.uint8(0xFE)) | data_bits[:count]
+    
+    def _extract_bits1(self, img_array: np.ndarray, positions: Positions, length_bytes: int) -> bytes:
+        """Single-LSB extraction: pack the LSB at each position straight into bytes."""
+        idx = self._first_positions(positions, length_bytes * 8)
+        return np.packbits(img_array.reshape(-1)[idx] & np.uint8(1)).tobytes()
+    
+    def _get_channel_indices(self, channels: List[str]) -> np.ndarray:
+        """Map channel names to indices (memoized per channel list)."""
+        key = tuple(channels) if channels else ()
+        indices = self._channel_cache.get(key)
+        if indices is None:
+            channel_map = {'red': 0, 'green': 1, 'blue': 2}
+            if not channels:
+                indices = np.array([0, 1, 2], dtype=np.int64)
+            else:
+                indices = np.array([channel_map[ch] for ch in channels if ch in channel_map], dtype=np.int64)
+            indices.setflags(write=False)
+            self._channel_cache[key] = indices
+        return indices
     
     def _encrypt_payload(self, payload: bytes, password: str) -> bytes:
-        """Encrypt payload using AES encryption."""
-        # Derive key from password
+        """Encrypt payload using AES-256-GCM. Returns salt + nonce + ciphertext (with tag)."""
+        # Derive key from password (a fresh salt per payload)
         salt = os.urandom(16)
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        fernet = Fernet(key)
+        aesgcm = AESGCM(_derive_key(password, salt))
         
         # Encrypt payload
-        encrypted = fernet.encrypt(payload)
+        nonce = os.urandom(12)
+        encrypted = aesgcm.encrypt(nonce, payload, None)
         
-        # Prepend salt to encrypted data
-        return salt + encrypted
+        # Prepend salt and nonce to encrypted data
+        return salt + nonce + encrypted
     
     def _decrypt_payload(self, encrypted_payload: bytes, password: str) -> bytes:
-        """Decrypt payload using AES decryption."""
-        # Extract salt
+        """Decrypt an AES-256-GCM payload produced by _encrypt_payload."""
+        # Extract salt and nonce; the ciphertext is passed as a view so a
+        # multi-MB payload is not copied before GCM decrypts it
         salt = encrypted_payload[:16]
-        encrypted_data = encrypted_payload[16:]
+        nonce = encrypted_payload[16:28]
+        encrypted_data = memoryview(encrypted_payload)[28:]
         
-        # Derive key from password
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        fernet = Fernet(key)
+        # Derive key from password; a round-trip of our own embed hits the cache
+        aesgcm = AESGCM(_derive_key(password, salt))
         
-        # Decrypt payload
-        return fernet.decrypt(encrypted_data)
+        # Decrypt payload (raises InvalidTag on a wrong password or tampering)
+        return aesgcm.decrypt(nonce, encrypted_data, None)
     
-    def _calculate_metrics(self, original: np.ndarray, stego: np.ndarray) -> Dict[str, float]:
-        """Calculate PSNR and SSIM metrics."""
-        # Calculate PSNR
-        mse = np.mean((original - stego) ** 2)
+    def _calculate_metrics(self,
+                           stego: np.ndarray,
+                           positions: Positions,
+                           original_values: np.ndarray) -> Dict[str, float]:
+        """
+        Calculate PSNR and SSIM metrics. Only the samples at `positions` differ
+        from the carrier, whose values there are `original_values`.
+        """
+        # Both metrics follow from five sums. The stego image's own sums take
+        # one buffered integer pass each; the carrier's differ from them only
+        # at the touched positions, so those are corrected from the saved
+        # values instead of keeping a full copy of the carrier. All sums are
+        # exact integers, so the algebraic forms below lose nothing.
+        flat = stego.reshape(-1)
+        n = flat.size
+        sum_s = int(flat.sum(dtype=np.int64))
+        sum_ss = int(np.einsum('i,i->', flat, flat, dtype=np.int64))
+        
+        touched = flat[positions].astype(np.int64)
+        diff = original_values.astype(np.int64) - touched
+        sum_o = sum_s + int(diff.sum())
+        sum_os = sum_ss + int(np.dot(touched, diff))
+        sum_oo = sum_os + int(np.dot(original_values.astype(np.int64), diff))
+        
+        # Calculate PSNR (only touched samples contribute to the error)
+        mse = int(np.dot(diff, diff)) / n
         if mse == 0:
             psnr = float('inf')
         else:
             psnr = 20 * np.log10(255.0 / np.sqrt(mse))
         
         # Calculate SSIM (simplified version)
-        mu1 = np.mean(original)
-        mu2 = np.mean(stego)
-        sigma1 = np.var(original)
-        sigma2 = np.var(stego)
-        sigma12 = np.mean((original - mu1) * (stego - mu2))
+        mu1 = sum_o / n
+        mu2 = sum_s / n
+        sigma1 = sum_oo / n - mu1 ** 2
+        sigma2 = sum_ss / n - mu2 ** 2
+        sigma12 = sum_os / n - mu1 * mu2
         
         c1 = 0.01 ** 2
         c2 = 0.03 ** 2
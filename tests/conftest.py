@@ -3,61 +3,99 @@ Pytest configuration and shared fixtures for StegoLab tests.
 """
 
 import pytest
-import tempfile
+import base64
 import os
+from types import SimpleNamespace
 from PIL import Image
 import numpy as np
+from backend.analysis import SteganalysisEngine
+from backend.steganography import SteganographyEngine
+
+# Sample text payload shared by test modules
+SAMPLE_TEXT_PAYLOAD = b"This is a test message for StegoLab steganography testing. " * 10
+
+def stego_bytes(result):
+    """Decode the base64 stego PNG returned by SteganographyEngine.embed."""
+    return base64.b64decode(result['stego_image'])
+
+def roundtrip(engine, carrier, payload, bits=1, channels=None, password=None, encrypt=False):
+    """Embed a payload, then extract it from the in-memory stego image.
+    Returns the embed and extract results."""
+    result = engine.embed(
+        carrier=carrier,
+        payload_data=payload,
+        bits=bits,
+        channels=channels,
+        password=password,
+        encrypt=encrypt
+    )
+    extract_result = engine.extract(
+        stego=stego_bytes(result),
+        bits=bits,
+        channels=channels,
+        password=password,
+        encrypt=encrypt
+    )
+    return result, extract_result
 
 @pytest.fixture(scope="session")
-def test_data_dir():
+def analysis_engine():
+    """Create a steganalysis engine instance shared by the whole session."""
+    return SteganalysisEngine()
+
+@pytest.fixture(scope="session")
+def stego_engine():
+    """Create a steganography engine instance shared by the whole session."""
+    return SteganographyEngine()
+
+@pytest.fixture(scope="session")
+def test_data_dir(tmp_path_factory):
     """Create a temporary directory for test data."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        yield tmpdir
+    return str(tmp_path_factory.mktemp("stego"))
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_png_image(test_data_dir):
     """Create a sample PNG image for testing."""
-    # Create a 200x200 RGB image with some pattern
-    img_array = np.zeros((200, 200, 3), dtype=np.uint8)
-    
-    # Add some pattern to make it more realistic
-    for i in range(200):
-        for j in range(200):
-            img_array[i, j, 0] = (i + j) % 256  # Red channel
-            img_array[i, j, 1] = (i * 2 + j) % 256  # Green channel
-            img_array[i, j, 2] = (i + j * 2) % 256  # Blue channel
+    # Create a 200x200 RGB image with some pattern to make it more realistic
+    i, j = np.ogrid[:200, :200]
+    img_array = np.dstack([
+        ((i + j) & 0xFF).astype(np.uint8),  # Red channel
+        ((i * 2 + j) & 0xFF).astype(np.uint8),  # Green channel
+        ((i + j * 2) & 0xFF).astype(np.uint8),  # Blue channel
+    ])
     
     img = Image.fromarray(img_array, 'RGB')
     img_path = os.path.join(test_data_dir, 'sample.png')
-    img.save(img_path)
+    img.save(img_path, compress_level=0)  # fixtures gain nothing from zlib
     
     return img_path
 
-@pytest.fixture
-def sample_bmp_image(test_data_dir):
+@pytest.fixture(scope="session")
+def random_rgb_array():
+    """Seeded 100x100 random RGB data shared (read-only) by the random carriers."""
+    rng = np.random.default_rng(seed=42)
+    img_array = rng.integers(0, 256, size=(100, 100, 3), dtype=np.uint8)
+    img_array.setflags(write=False)
+    return img_array
+
+@pytest.fixture(scope="session")
+def sample_bmp_image(test_data_dir, random_rgb_array):
     """Create a sample BMP image for testing."""
-    # Create a 100x100 RGB image
-    img_array = np.random.randint(0, 256, (100, 100, 3), dtype=np.uint8)
-    img = Image.fromarray(img_array, 'RGB')
+    img = Image.fromarray(random_rgb_array, 'RGB')
     img_path = os.path.join(test_data_dir, 'sample.bmp')
     img.save(img_path)
     
     return img_path
 
-@pytest.fixture
-def sample_text_payload():
-    """Create a sample text payload for testing."""
-    return b"This is a test message for StegoLab steganography testing. " * 10
-
-@pytest.fixture
-def sample_binary_payload():
-    """Create a sample binary payload for testing."""
-    return bytes(range(256))  # All byte values 0-255
-
-@pytest.fixture
-def large_payload():
-    """Create a large payload for capacity testing."""
-    return b"Large payload data " * 1000  # ~18KB
+@pytest.fixture(scope="session")
+def clean_image(test_data_dir, random_rgb_array):
+    """Create a clean test image without steganography (path and decoded array)."""
+    img = Image.fromarray(random_rgb_array, 'RGB')
+    img_path = os.path.join(test_data_dir, 'clean.png')
+    img.save(img_path, compress_level=0)  # fixtures gain nothing from zlib
+    
+    # PNG is lossless, so the generated (read-only) array is the decoded image
+    return SimpleNamespace(path=img_path, array=random_rgb_array)
 
 # Pytest configuration
 def pytest_configure(config):
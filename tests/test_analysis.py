@@ -6,48 +6,23 @@ Tests statistical detectors and analysis methods.
 import pytest
 import numpy as np
 from PIL import Image
-import tempfile
-import os
-from backend.analysis import SteganalysisEngine
-from backend.steganography import SteganographyEngine
+import io
+from types import SimpleNamespace
+from backend import analysis
+from backend.analysis import numba
+from tests.conftest import stego_bytes
 
 class TestSteganalysisEngine:
     """Test cases for the SteganalysisEngine class."""
     
-    @pytest.fixture
-    def analysis_engine(self):
-        """Create a steganalysis engine instance for testing."""
-        return SteganalysisEngine()
-    
-    @pytest.fixture
-    def stego_engine(self):
-        """Create a steganography engine instance for testing."""
-        return SteganographyEngine()
-    
-    @pytest.fixture
-    def clean_image(self):
-        """Create a clean test image without steganography."""
-        # Create a 100x100 RGB test image with natural-looking data
-        np.random.seed(42)  # For reproducible results
-        img_array = np.random.randint(0, 256, (100, 100, 3), dtype=np.uint8)
-        img = Image.fromarray(img_array, 'RGB')
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-            img.save(tmp.name)
-            yield tmp.name
-        
-        # Clean up
-        os.unlink(tmp.name)
-    
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def stego_image(self, stego_engine, clean_image):
-        """Create a stego image with embedded data."""
+        """Create a stego image with embedded data (PNG bytes and decoded array)."""
         payload = b"This is a test message for steganalysis testing."
         
         # Embed data in the clean image
         result = stego_engine.embed(
-            carrier_path=clean_image,
+            carrier=clean_image.path,
             payload_data=payload,
             bits=1,
             channels=['red', 'green', 'blue'],
@@ -55,20 +30,25 @@ class TestSteganalysisEngine:
             encrypt=False
         )
         
-        # Save stego image to temporary file
-        import base64
-        stego_data = base64.b64decode(result['stego_image'])
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-            tmp.write(stego_data)
-            yield tmp.name
-        
-        # Clean up
-        os.unlink(tmp.name)
+        # Keep the encoded stego PNG in memory, decoded once
+        data = stego_bytes(result)
+        array = np.array(Image.open(io.BytesIO(data)))
+        array.setflags(write=False)
+        return SimpleNamespace(data=data, array=array)
+    
+    @pytest.fixture(scope="module")
+    def clean_analysis(self, analysis_engine, clean_image):
+        """Full analysis (with visualizations) of the clean image, run once."""
+        return analysis_engine.analyze(clean_image.path, with_visuals=True)
+    
+    @pytest.fixture(scope="module")
+    def stego_analysis(self, analysis_engine, stego_image):
+        """Full analysis (with visualizations) of the stego image, run once."""
+        return analysis_engine.analyze(stego_image.data, with_visuals=True)
     
     def test_chi_square_test_clean_image(self, analysis_engine, clean_image):
         """Test chi-square test on clean image."""
-        img = Image.open(clean_image)
-        img_array = np.array(img)
+        img_array = clean_image.array
         
         chi_square_results = analysis_engine._chi_square_test(img_array)
         
@@ -90,8 +70,7 @@ class TestSteganalysisEngine:
     
     def test_chi_square_test_stego_image(self, analysis_engine, stego_image):
         """Test chi-square test on stego image."""
-        img = Image.open(stego_image)
-        img_array = np.array(img)
+        img_array = stego_image.array
         
         chi_square_results = analysis_engine._chi_square_test(img_array)
         
@@ -101,14 +80,11 @@ class TestSteganalysisEngine:
         assert 'blue' in chi_square_results
         
         # For a stego image, at least one channel should be suspicious
-        suspicious_channels = [channel for channel, result in chi_square_results.items() 
-                              if result['suspicious']]
-        assert len(suspicious_channels) > 0  # At least one channel should be suspicious
+        assert any(result['suspicious'] for result in chi_square_results.values())
     
     def test_rs_analysis_clean_image(self, analysis_engine, clean_image):
         """Test RS analysis on clean image."""
-        img = Image.open(clean_image)
-        img_array = np.array(img)
+        img_array = clean_image.array
         
         rs_results = analysis_engine._rs_analysis(img_array)
         
@@ -128,8 +104,7 @@ class TestSteganalysisEngine:
     
     def test_rs_analysis_stego_image(self, analysis_engine, stego_image):
         """Test RS analysis on stego image."""
-        img = Image.open(stego_image)
-        img_array = np.array(img)
+        img_array = stego_image.array
         
         rs_results = analysis_engine._rs_analysis(img_array)
         
@@ -139,15 +114,12 @@ class TestSteganalysisEngine:
         assert 'blue' in rs_results
         
         # For a stego image, RS analysis should detect some anomalies
-        suspicious_channels = [channel for channel, result in rs_results.items() 
-                              if result['suspicious']]
         # Note: RS analysis might not always detect LSB steganography
         # This test ensures the method runs without errors
     
     def test_bitplane_analysis_clean_image(self, analysis_engine, clean_image):
         """Test bit-plane analysis on clean image."""
-        img = Image.open(clean_image)
-        img_array = np.array(img)
+        img_array = clean_image.array
         
         bitplane_results = analysis_engine._bitplane_analysis(img_array)
         
@@ -171,8 +143,7 @@ class TestSteganalysisEngine:
     
     def test_bitplane_analysis_stego_image(self, analysis_engine, stego_image):
         """Test bit-plane analysis on stego image."""
-        img = Image.open(stego_image)
-        img_array = np.array(img)
+        img_array = stego_image.array
         
         bitplane_results = analysis_engine._bitplane_analysis(img_array)
         
@@ -182,19 +153,14 @@ class TestSteganalysisEngine:
         assert 'blue' in bitplane_results
         
         # For a stego image, bit-plane analysis should detect some anomalies
-        suspicious_channels = [channel for channel, result in bitplane_results.items() 
-                              if result['suspicious']]
         # At least one channel should show suspicious patterns
-        assert len(suspicious_channels) > 0
+        assert any(result['suspicious'] for result in bitplane_results.values())
     
     def test_confidence_calculation_clean_image(self, analysis_engine, clean_image):
         """Test confidence calculation on clean image."""
-        img = Image.open(clean_image)
-        img_array = np.array(img)
+        img_array = clean_image.array
         
-        chi_square_results = analysis_engine._chi_square_test(img_array)
-        rs_results = analysis_engine._rs_analysis(img_array)
-        bitplane_results = analysis_engine._bitplane_analysis(img_array)
+        chi_square_results, rs_results, bitplane_results = analysis_engine._analyze_all(img_array)
         
         confidence = analysis_engine._calculate_confidence(
             chi_square_results, rs_results, bitplane_results
@@ -206,12 +172,9 @@ class TestSteganalysisEngine:
     
     def test_confidence_calculation_stego_image(self, analysis_engine, stego_image):
         """Test confidence calculation on stego image."""
-        img = Image.open(stego_image)
-        img_array = np.array(img)
+        img_array = stego_image.array
         
-        chi_square_results = analysis_engine._chi_square_test(img_array)
-        rs_results = analysis_engine._rs_analysis(img_array)
-        bitplane_results = analysis_engine._bitplane_analysis(img_array)
+        chi_square_results, rs_results, bitplane_results = analysis_engine._analyze_all(img_array)
         
         confidence = analysis_engine._calculate_confidence(
             chi_square_results, rs_results, bitplane_results
@@ -221,9 +184,9 @@ class TestSteganalysisEngine:
         assert 0 <= confidence <= 1
         assert confidence > 0.3  # Higher confidence for stego images
     
-    def test_full_analysis_clean_image(self, analysis_engine, clean_image):
+    def test_full_analysis_clean_image(self, clean_analysis):
         """Test complete analysis on clean image."""
-        result = analysis_engine.analyze(clean_image)
+        result = clean_analysis
         
         # Check that all expected fields are present
         assert 'confidence' in result
@@ -245,9 +208,9 @@ class TestSteganalysisEngine:
         assert 'green_bitplanes' in result['visualizations']
         assert 'blue_bitplanes' in result['visualizations']
     
-    def test_full_analysis_stego_image(self, analysis_engine, stego_image):
+    def test_full_analysis_stego_image(self, stego_analysis):
         """Test complete analysis on stego image."""
-        result = analysis_engine.analyze(stego_image)
+        result = stego_analysis
         
         # Check that all expected fields are present
         assert 'confidence' in result
@@ -267,6 +230,118 @@ class TestSteganalysisEngine:
         explanation_lower = result['explanation'].lower()
         assert 'steganographic' in explanation_lower or 'lsb' in explanation_lower
     
+    def test_analysis_without_visuals(self, analysis_engine, clean_image):
+        """Test that visualizations are only rendered on request."""
+        result = analysis_engine.analyze(clean_image.path)
+        
+        assert 'confidence' in result
+        assert 'explanation' in result
+        assert 'visualizations' not in result
+        
+        visualizations = analysis_engine.visualize(clean_image.path)
+        assert 'lsb_histogram' in visualizations
+        assert 'red_bitplanes' in visualizations
+    
+    def test_analysis_from_bytes(self, analysis_engine, clean_image, clean_analysis):
+        """Test that in-memory image bytes give the same result as a path."""
+        with open(clean_image.path, 'rb') as f:
+            image_data = f.read()
+        
+        from_bytes = analysis_engine.analyze(image_data)
+        from_path = clean_analysis
+        
+        assert from_bytes['confidence'] == from_path['confidence']
+        assert from_bytes['chi_square'] == from_path['chi_square']
+    
+    def test_analysis_from_gif(self, analysis_engine, random_rgb_array, tmp_path):
+        """Test that formats OpenCV cannot decode fall back to Pillow."""
+        gif_path = str(tmp_path / 'image.gif')
+        img = Image.fromarray(random_rgb_array, 'RGB').convert('P')
+        img.save(gif_path, format='GIF')
+        
+        expected = np.array(img.convert('RGB'))
+        
+        assert np.array_equal(analysis_engine._load_image(gif_path), expected)
+        assert 'confidence' in analysis_engine.analyze(gif_path)
+    
+    def test_analysis_ignores_exif_orientation(self, analysis_engine, random_rgb_array):
+        """Test that encoded bytes decode in stored pixel order, like a PIL image."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise to display
+        img = Image.fromarray(random_rgb_array[:60], 'RGB')
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', exif=exif)
+        
+        from_bytes = analysis_engine._load_image(buffer.getvalue())
+        from_pil = analysis_engine._load_image(Image.open(io.BytesIO(buffer.getvalue())))
+        
+        assert from_bytes.shape == (60, 100, 3)
+        assert np.array_equal(from_bytes, from_pil)
+    
+    @pytest.mark.parametrize("use_numba", [False, True])
+    def test_balanced_chi_square_stego_is_flagged(self, analysis_engine, monkeypatch, use_numba):
+        """Test that a stego image whose LSB pairs look balanced is still flagged by RS and bit-plane analysis."""
+        if use_numba and numba is None:
+            pytest.skip("numba not installed")
+        if not use_numba:
+            monkeypatch.setattr(analysis, 'numba', None)
+        
+        # A noisy gradient with its first half of samples overwritten in
+        # embedding order keeps every channel's chi-square p-value high
+        i, j = np.mgrid[:300, :300]
+        base = np.stack([i * 255 // 299, j * 255 // 299, (i + j) * 255 // 598], axis=-1).astype(float)
+        base += np.random.default_rng(0).normal(0, 2, base.shape)
+        image = np.clip(base, 0, 255).astype(np.uint8)
+        
+        flat = image.reshape(-1)
+        count = flat.size // 2
+        flat[:count] = (flat[:count] & 0xFE) | np.random.default_rng(8).integers(0, 2, count, dtype=np.uint8)
+        
+        result = analysis_engine.analyze(image)
+        
+        assert all(r['p_value'] > 0.5 for r in result['chi_square'].values())
+        assert result['rs_score'] and result['bitplane_stats']
+        assert result['confidence'] > 0.3
+    
+    @pytest.mark.skipif(numba is None, reason="numba not installed")
+    def test_fused_analysis_keeps_computed_results(self, analysis_engine):
+        """Test that the fused pass reports the RS and bit-plane results it already computed."""
+        image = np.zeros((64, 64, 3), dtype=np.uint8)
+        image[:, 1::2] = 1
+        
+        result = analysis_engine.analyze(image)
+        chi_square, rs, bitplane = analysis_engine._analyze_all(image)
+        
+        assert result['rs_score'] == rs
+        assert result['bitplane_stats'] == bitplane
+        assert result['confidence'] == analysis_engine._calculate_confidence(chi_square, rs, bitplane)
+    
+    @pytest.mark.skipif(numba is None, reason="numba not installed")
+    def test_fused_analysis_matches_detectors(self, analysis_engine, clean_image):
+        """Test that the fused kernel reproduces the individual detectors."""
+        img_array = analysis_engine._load_image(clean_image.path)
+        channels = analysis_engine._split_channels(img_array)
+        bitplanes = analysis_engine._extract_bitplanes(channels, 2)
+        
+        chi_square, rs, bitplane = analysis_engine._fused_analysis(channels)
+        
+        assert chi_square == analysis_engine._chi_square_test(img_array, bitplanes)
+        assert rs == analysis_engine._rs_analysis(img_array, channels)
+        expected = analysis_engine._bitplane_analysis(img_array, bitplanes)
+        for channel in ['red', 'green', 'blue']:
+            assert bitplane[channel]['suspicious'] == expected[channel]['suspicious']
+            assert bitplane[channel]['variance_ratio'] == pytest.approx(expected[channel]['variance_ratio'])
+    
+    def test_downsample_large_image(self, analysis_engine):
+        """Test that images above the pixel cap are subsampled before analysis."""
+        small = np.zeros((100, 100, 3), dtype=np.uint8)
+        assert analysis_engine._downsample(small) is small
+        
+        large = np.zeros((3000, 4000, 3), dtype=np.uint8)
+        subsampled = analysis_engine._downsample(large)
+        assert subsampled.shape[0] * subsampled.shape[1] <= analysis_engine.MAX_ANALYSIS_PIXELS
+        assert subsampled.shape[2] == 3
+    
     def test_explanation_generation(self, analysis_engine):
         """Test explanation generation for different confidence levels."""
         # Test low confidence
@@ -296,8 +371,7 @@ class TestSteganalysisEngine:
     
     def test_visualization_generation(self, analysis_engine, clean_image):
         """Test that visualizations are generated correctly."""
-        img = Image.open(clean_image)
-        img_array = np.array(img)
+        img_array = clean_image.array
         
         visualizations = analysis_engine._generate_visualizations(img_array)
         
@@ -0,0 +1,69 @@
+"""
+API tests for the StegoLab FastAPI endpoints.
+"""
+
+import io
+import os
+import sys
+import pytest
+from PIL import Image
+from fastapi.testclient import TestClient
+
+# main.py imports its sibling modules flat, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+import main
+
+@pytest.fixture(scope="module")
+def client():
+    """Test client for the FastAPI app."""
+    return TestClient(main.app)
+
+@pytest.fixture(scope="module")
+def png_data(random_rgb_array):
+    """The seeded random carrier encoded as PNG bytes."""
+    buffer = io.BytesIO()
+    Image.fromarray(random_rgb_array, 'RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+class TestCapacityEndpoint:
+    """Test cases for /api/capacity."""
+    
+    def test_capacity(self, client, png_data, stego_engine):
+        """Test that a PNG upload reports its dimensions and header-only capacity."""
+        response = client.post('/api/capacity', files={'image': ('carrier.png', png_data, 'image/png')},
+                               data={'bits': '2'})
+        
+        assert response.status_code == 200
+        assert response.json() == {
+            'width': 100,
+            'height': 100,
+            'capacity_bytes': stego_engine.capacity_from_dims(100, 100, 2, 3),
+        }
+    
+    def test_capacity_rejects_bad_bits(self, client, png_data):
+        """Test that an unsupported bit depth is a client error."""
+        response = client.post('/api/capacity', files={'image': ('carrier.png', png_data, 'image/png')},
+                               data={'bits': '3'})
+        
+        assert response.status_code == 400
+        assert response.json()['detail'] == "bits must be 1 or 2"
+    
+    def test_capacity_rejects_unsupported_format(self, client, random_rgb_array):
+        """Test that a GIF upload is a client error rather than a server error."""
+        buffer = io.BytesIO()
+        Image.fromarray(random_rgb_array, 'RGB').save(buffer, 'GIF')
+        
+        response = client.post('/api/capacity', files={'image': ('carrier.gif', buffer.getvalue(), 'image/gif')})
+        
+        assert response.status_code == 400
+    
+    @pytest.mark.parametrize("filename,data", [
+        ('garbage.png', b'not an image at all'),
+        ('garbage.bmp', b'BM' + bytes(40)),
+        ('truncated.png', b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00'),
+    ])
+    def test_capacity_rejects_malformed_image(self, client, filename, data):
+        """Test that an undecodable or truncated upload is a client error."""
+        response = client.post('/api/capacity', files={'image': (filename, data, 'application/octet-stream')})
+        
+        assert response.status_code == 400